@@ -1,7 +1,11 @@
+import math
+import textwrap
+from functools import lru_cache
+
 import streamlit as st
 import numpy as np
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.figure import Figure
 
 # Set page configuration
 st.set_page_config(
@@ -11,16 +15,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Show the bending cost input, cost summary and cost analysis card
+SHOW_COST = True
+
+@lru_cache(maxsize=128)
+def calculate_angle_trig(degree):
+    """Return the sine and cosine of a fold angle given in degrees"""
+    radian = math.radians(degree)
+    return math.sin(radian), math.cos(radian)
+
+@st.cache_data(max_entries=128)
 def calculate_corrugated_profile(A, D, degree, total_length):
     """Calculate the actual corrugated profile with realistic geometry"""
-    # Convert angle to radians
-    radian = np.deg2rad(degree)
+    # The fold angle slider has only a few dozen integer values, so trig is memoized
+    sin_a, cos_a = calculate_angle_trig(degree)
     
     # Calculate the horizontal distance from valley to peak
-    L = round(D / np.tan(radian), 2)
+    L = D * cos_a / sin_a
     
     # Calculate actual slant length (hypotenuse)
-    slant_length = round(D / np.sin(radian), 2)
+    slant_length = D / sin_a
     
     # One complete corrugation cycle consists of:
     # - Flat bottom (A)
@@ -36,64 +50,43 @@ def calculate_corrugated_profile(A, D, degree, total_length):
     leftover = total_length - used_length
     
     # Generate the actual corrugated profile
-    x_profile = []  # Horizontal position
-    z_profile = []  # Vertical position (height)
-    
-    x_current = 0
-    
-    for i in range(N):
-        # Flat bottom section
-        x_profile.extend([x_current, x_current + A])
-        z_profile.extend([0, 0])
-        x_current += A
-        
-        # Slant up to peak
-        x_profile.append(x_current + L)
-        z_profile.append(D)
-        x_current += L
-        
-        # Slant down to valley
-        x_profile.append(x_current + L)
-        z_profile.append(0)
-        x_current += L
-    
+    # Each module contributes 4 points (flat start, flat end, peak, valley)
+    # and the profile closes with a 2-point flat segment
+    n_points = 4 * N + 2 if N > 0 else 0
+    x_profile = np.empty(n_points)  # Horizontal position
+    z_profile = np.empty(n_points)  # Vertical position (height)
+
+    module_pitch = A + 2 * L  # Horizontal distance covered by one module
+    x_offsets = np.array([0, A, A + L, A + 2 * L])
+    z_offsets = np.array([0, 0, D, 0])
+
+    # Fill the module points in place through (N, 4) views of the buffers
+    x_profile[:4 * N].reshape(N, 4)[:] = np.arange(N)[:, None] * module_pitch + x_offsets
+    z_profile[:4 * N].reshape(N, 4)[:] = z_offsets
+
+    x_current = N * module_pitch
+
     # Always end with a flat segment of length A
     if N > 0:  # Only if we have at least one complete module
-        x_profile.extend([x_current, x_current + A])
-        z_profile.extend([0, 0])
+        x_profile[-2:] = (x_current, x_current + A)
+        z_profile[-2:] = 0
         x_current += A
         # Adjust used length to include the final flat segment
         used_length += A
         leftover = total_length - used_length
     
     # Handle leftover material
-    leftover_profile_x = []
-    leftover_profile_z = []
-    
-    if leftover > 0:
-        if leftover >= slant_length:
-            # Add complete slant up
-            leftover_profile_x.append(x_current + L)
-            leftover_profile_z.append(D)
-            x_current += L
-            leftover -= slant_length
-            
-            # Add partial slant down if remaining
-            if leftover > 0:
-                partial_slant = min(leftover, slant_length)
-                partial_height = D - (partial_slant * np.sin(radian))
-                partial_horizontal = partial_slant * np.cos(radian)
-                
-                leftover_profile_x.append(x_current + partial_horizontal)
-                leftover_profile_z.append(max(0, partial_height))
-        else:
-            # Partial slant up only
-            partial_slant = leftover
-            partial_height = partial_slant * np.sin(radian)
-            partial_horizontal = partial_slant * np.cos(radian)
-            
-            leftover_profile_x.append(x_current + partial_horizontal)
-            leftover_profile_z.append(partial_height)
+    # The leftover climbs the next slant up, then runs down the following slant;
+    # each slant gets the fraction of its length the leftover covers, in [0, 1]
+    ratio = max(leftover, 0) / slant_length
+    n_leftover = int(ratio > 0) + int(ratio > 1)
+    slant_fractions = np.clip(ratio - np.arange(n_leftover), 0, 1)
+    
+    leftover_profile_x = x_current + L * np.cumsum(slant_fractions)
+    leftover_profile_z = D * np.cumsum(slant_fractions * np.array([1, -1])[:n_leftover])
+
+    # A leftover that reaches the peak counts its slant up as used material
+    leftover -= slant_length * (ratio >= 1)
     
     return (x_profile, z_profile, leftover_profile_x, leftover_profile_z, 
             N, module_physical_length, L, slant_length, used_length, leftover)
@@ -105,27 +98,25 @@ def calculate_bending_cost(N, leftover_x, leftover_z, cost_per_bend=50):
     # Each complete module has 3 bends (flat-to-up, up-to-down, down-to-flat)
     complete_module_bends = N * 3
     
-    # Count bends for leftover material
+    # Bends in the leftover material are not charged, so leftover_x and
+    # leftover_z are currently unused
     leftover_bends = 0
-    if leftover_x and leftover_z:
-        # Count the number of direction changes in leftover profile
-        if len(leftover_z) > 0:
-            for i in range(len(leftover_z)):
-                if leftover_z[i] > 0:  # If there's any height, there's at least one bend
-                    leftover_bends += 0
-                    # If we reach peak and come down, that's another bend
-                    if i > 0 and leftover_z[i] > leftover_z[i-1]:
-                        leftover_bends += 0
-                    break
     
     total_bends = complete_module_bends + leftover_bends
     total_cost = total_bends * cost_per_bend
     
     return total_bends, total_cost, complete_module_bends, leftover_bends
 
-def create_main_plot(x_profile, z_profile, leftover_x, leftover_z, A, D, N, efficiency, design_failed):
-    """Create the main corrugated profile plot"""
-    fig, ax = plt.subplots(figsize=(14, 6))
+def get_plot_axes(key, figsize):
+    """Get the Axes stored in session state under key, creating its Figure once per session"""
+    if key not in st.session_state:
+        fig = Figure(figsize=figsize)
+        st.session_state[key] = fig.subplots()
+    return st.session_state[key]
+
+def create_main_plot(ax, x_profile, z_profile, leftover_x, leftover_z, A, D, N, efficiency, design_failed):
+    """Draw the main corrugated profile plot onto a reused Axes"""
+    ax.clear()
     
     # Set background color based on failure status
     if design_failed:
@@ -133,25 +124,32 @@ def create_main_plot(x_profile, z_profile, leftover_x, leftover_z, A, D, N, effi
     else:
         ax.set_facecolor('white')
     
-    if x_profile and z_profile:
+    if len(x_profile) and len(z_profile):
         # Choose colors based on failure status
         main_color = 'red' if design_failed else 'blue'
         leftover_color = 'darkred' if design_failed else 'red'
         
         # Plot main corrugated profile
         ax.plot(x_profile, z_profile, color=main_color, linewidth=2, 
-                marker='o', markersize=3, label='Corrugated Profile')
+                label='Corrugated Profile')
+        
+        # Mark the 3 bend points of each module (skipping its flat start point)
+        bends_x = x_profile[:4*N].reshape(N, 4)[:, 1:]
+        bends_z = z_profile[:4*N].reshape(N, 4)[:, 1:]
+        ax.scatter(bends_x.ravel(), bends_z.ravel(), color=main_color, s=9, zorder=3)
         
         # Plot leftover material
-        if leftover_x and leftover_z:
+        if len(leftover_x) and len(leftover_z):
             leftover_label = f'Leftover - Partial'
             ax.plot(leftover_x, leftover_z, color=leftover_color, linewidth=3, 
                     marker='s', markersize=4, label=leftover_label)
             # Fill under the curve
             ax.fill_between(leftover_x, leftover_z, alpha=0.3, color=leftover_color)
         
-        # Fill under main profile
-        ax.fill_between(x_profile, z_profile, alpha=0.2, color=main_color)
+        # Fill under main profile as a single polygon closed along the baseline
+        fill_vertices = np.column_stack([np.r_[x_profile, x_profile[-1], x_profile[0]],
+                                         np.r_[z_profile, 0, 0]])
+        ax.add_patch(patches.Polygon(fill_vertices, alpha=0.2, color=main_color))
     
     # Set plot properties
     title_color = 'red' if design_failed else 'black'
@@ -163,16 +161,17 @@ def create_main_plot(x_profile, z_profile, leftover_x, leftover_z, A, D, N, effi
     ax.legend()
     
     # Dynamic limits
-    if x_profile:
-        max_x = max(x_profile + leftover_x) if leftover_x else max(x_profile)
+    if len(x_profile):
+        # x increases monotonically along the profile, so the last point is the maximum
+        max_x = leftover_x[-1] if len(leftover_x) else x_profile[-1]
         ax.set_xlim(0, max_x * 1.05)
         ax.set_ylim(-D*0.1, D*1.2)
     
-    return fig
+    return ax.figure
 
-def create_cross_section_plot(A, D, L, degree):
-    """Create the cross-section plot"""
-    fig, ax = plt.subplots(figsize=(8, 6))
+def create_cross_section_plot(ax, A, D, L, degree):
+    """Draw the cross-section plot onto a reused Axes"""
+    ax.clear()
     
     # Draw one complete corrugation cross-section
     x_cross = [0, A, A + L, A + 2*L, A + 2*L + A]
@@ -217,47 +216,71 @@ def create_cross_section_plot(A, D, L, degree):
     ax.set_xlim(-peak_to_peak*0.15, peak_to_peak*1.15)
     ax.set_ylim(-D*0.4, D*1.5)
     
-    return fig
+    return ax.figure
+
+def render_card(title, body_md, design_failed=False, colors=None):
+    """Render a bordered specification card, highlighted red when the design failed
+
+    colors is an optional (background, border, title_color) tuple that replaces
+    the default scheme.
+    """
+    if colors:
+        background, border, title_color = colors
+    elif design_failed:
+        background, border, title_color = '#ffcccc', 'red', 'darkred'
+    else:
+        background, border, title_color = 'white', 'darkblue', 'darkblue'
+    
+    st.markdown(f"""<div style="background-color: {background}; padding: 15px; border-radius: 10px; border: 2px solid {border};">
+<h4 style="color: {title_color};">{title}</h4>
+
+{textwrap.dedent(body_md).strip()}
+
+</div>""", unsafe_allow_html=True)
 
 # Main Streamlit App
 def main():
     st.title("🏠 Corrugated Roof Calculator")
     st.markdown("Calculate corrugated roofing profiles with material optimization and bending cost analysis")
     
-    # Sidebar controls
-    st.sidebar.header("Design Parameters")
-    
-    A = st.sidebar.slider(
-        "Flat Bottom Width (A) - mm", 
-        min_value=10, max_value=200, value=90, step=1,
-        help="Width of the flat bottom section"
-    )
-    
-    D = st.sidebar.slider(
-        "Peak Height (D) - mm", 
-        min_value=10, max_value=200, value=60, step=1,
-        help="Height of the corrugation peak"
-    )
-    
-    degree = st.sidebar.slider(
-        "Fold Angle - degrees", 
-        min_value=15, max_value=85, value=45, step=1,
-        help="Angle of the corrugation sides"
-    )
-    
-    total_length = st.sidebar.slider(
-        "Total Sheet Length - mm", 
-        min_value=1000, max_value=5000, value=2440, step=10,
-        help="Available sheet material length"
-    )
-    
-    # Cost parameters
-    st.sidebar.header("Cost Parameters")
-    cost_per_bend = st.sidebar.number_input(
-        "Cost per Bend (฿)", 
-        min_value=1, max_value=1000, value=50, step=1,
-        help="Cost in Thai Baht for each bending operation"
-    )
+    # Sidebar controls, batched in a form so the app only reruns on submit
+    with st.sidebar.form("params"):
+        st.header("Design Parameters")
+        
+        A = st.slider(
+            "Flat Bottom Width (A) - mm", 
+            min_value=10, max_value=200, value=90, step=1,
+            help="Width of the flat bottom section"
+        )
+        
+        D = st.slider(
+            "Peak Height (D) - mm", 
+            min_value=10, max_value=200, value=60, step=1,
+            help="Height of the corrugation peak"
+        )
+        
+        degree = st.slider(
+            "Fold Angle - degrees", 
+            min_value=15, max_value=85, value=45, step=1,
+            help="Angle of the corrugation sides"
+        )
+        
+        total_length = st.slider(
+            "Total Sheet Length - mm", 
+            min_value=1000, max_value=5000, value=2440, step=10,
+            help="Available sheet material length"
+        )
+        
+        # Cost parameters
+        if SHOW_COST:
+            st.header("Cost Parameters")
+            cost_per_bend = st.number_input(
+                "Cost per Bend (฿)", 
+                min_value=1, max_value=1000, value=50, step=1,
+                help="Cost in Thai Baht for each bending operation"
+            )
+        
+        st.form_submit_button("Update")
     
     # Calculate profile
     (x_profile, z_profile, leftover_x, leftover_z, N, module_length, 
@@ -265,8 +288,9 @@ def main():
         A, D, degree, total_length)
     
     # Calculate bending costs
-    total_bends, total_cost, complete_bends, leftover_bends = calculate_bending_cost(
-        N, leftover_x, leftover_z, cost_per_bend)
+    if SHOW_COST:
+        total_bends, total_cost, complete_bends, leftover_bends = calculate_bending_cost(
+            N, leftover_x, leftover_z, cost_per_bend)
     
     # Check if design failed
     design_failed = used_length > total_length
@@ -283,46 +307,45 @@ def main():
         st.error("⚠️ Design Failure: Required material exceeds available sheet length!")
     
     # Cost summary at the top
-    st.subheader("💰 Bending Cost Summary")
-    cost_col1, cost_col2, cost_col3, cost_col4 = st.columns(4)
-    
-    with cost_col1:
-        st.metric("Total Bends", f"{total_bends}")
-    with cost_col2:
-        st.metric("Total Cost", f"฿{total_cost:,}")
+    if SHOW_COST:
+        st.subheader("💰 Bending Cost Summary")
+        cost_col1, cost_col2, cost_col3, cost_col4 = st.columns(4)
+        
+        with cost_col1:
+            st.metric("Total Bends", f"{total_bends}")
+        with cost_col2:
+            st.metric("Total Cost", f"฿{total_cost:,}")
     
     # Main plots
     col1, col2 = st.columns([2, 1])
     
     with col1:
         st.subheader("Corrugated Profile")
-        main_fig = create_main_plot(x_profile, z_profile, leftover_x, leftover_z, 
-                                   A, D, N, efficiency, design_failed)
-        st.pyplot(main_fig, use_container_width=True)
+        main_ax = get_plot_axes("main_ax", figsize=(14, 6))
+        # Only redraw when the geometry changes, not on cost-only reruns
+        main_key = (A, D, degree, total_length)
+        if st.session_state.get("main_key") != main_key:
+            create_main_plot(main_ax, x_profile, z_profile, leftover_x, leftover_z, 
+                             A, D, N, efficiency, design_failed)
+            st.session_state.main_key = main_key
+        st.pyplot(main_ax.figure, use_container_width=True)
     
     with col2:
         st.subheader("Cross-Section")
-        cross_fig = create_cross_section_plot(A, D, L, degree)
-        st.pyplot(cross_fig, use_container_width=True)
-    
-    # Specifications in three columns
+        cross_ax = get_plot_axes("cross_ax", figsize=(8, 6))
+        # The cross-section does not depend on the sheet length
+        cross_key = (A, D, L, degree)
+        if st.session_state.get("cross_key") != cross_key:
+            create_cross_section_plot(cross_ax, A, D, L, degree)
+            st.session_state.cross_key = cross_key
+        st.pyplot(cross_ax.figure, use_container_width=True)
+    
+    # Specifications in three columns, or two without the cost analysis
     st.subheader("Specifications")
-    spec_col1, spec_col2, spec_col3 = st.columns(3)
-    
-    with spec_col1:
-        # Determine styling based on failure
-        if design_failed:
-            st.markdown("""
-            <div style="background-color: #ffcccc; padding: 15px; border-radius: 10px; border: 2px solid red;">
-            <h4 style="color: darkred;">Basic Specifications</h4>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; border: 2px solid darkblue;">
-            <h4 style="color: darkblue;">Basic Specifications</h4>
-            """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
+    spec_cols = st.columns(3 if SHOW_COST else 2)
+    
+    with spec_cols[0]:
+        render_card("Basic Specifications", f"""
         **BASIC PARAMETERS:**
         - Flat Bottom Width (A): {A} mm
         - Peak Height (D): {D} mm
@@ -339,22 +362,10 @@ def main():
         - Coverage Width: {coverage_width:.1f} mm
         - Material Efficiency: {efficiency:.1f}%
         - Leftover Material: {leftover:.1f} mm
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with spec_col2:
-        if design_failed:
-            st.markdown("""
-            <div style="background-color: #ffcccc; padding: 15px; border-radius: 10px; border: 2px solid red;">
-            <h4 style="color: darkred;">Material & Structural Analysis</h4>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; border: 2px solid darkblue;">
-            <h4 style="color: darkblue;">Material & Structural Analysis</h4>
-            """, unsafe_allow_html=True)
-        
-        st.markdown(f"""
+        """, design_failed)
+    
+    with spec_cols[1]:
+        render_card("Material & Structural Analysis", f"""
         **MATERIAL BREAKDOWN:**
         - Flat Sections Total: {total_flat_length} mm
         - Slant Sections Total: {total_slant_length:.0f} mm
@@ -368,29 +379,23 @@ def main():
         
         **MANUFACTURING NOTES:**
         - Material Utilization: {((total_length-leftover)/total_length*100):.1f}%
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    with spec_col3:
-        st.markdown("""
-        <div style="background-color: #f0f8ff; padding: 15px; border-radius: 10px; border: 2px solid #4169e1;">
-        <h4 style="color: #4169e1;">💰 Cost Analysis</h4>
-        """, unsafe_allow_html=True)
-        
-        cost_per_module = (3 * cost_per_bend) if N > 0 else 0
-        cost_per_meter = (total_cost / (coverage_width/1000)) if coverage_width > 0 else 0
-        
-        st.markdown(f"""
-        **BENDING OPERATIONS:**
-        - Cost per Bend: ฿{cost_per_bend}
-        - Bends per Module: 3
-        - Cost per Module: ฿{cost_per_module}
-        - Complete Module Bends: {complete_bends}
-        
-        **COST BREAKDOWN:**
-        - Complete Modules: ฿{complete_bends * cost_per_bend:,}
-        """)
-        st.markdown("</div>", unsafe_allow_html=True)
+        """, design_failed)
+    
+    if SHOW_COST:
+        with spec_cols[2]:
+            cost_per_module = (3 * cost_per_bend) if N > 0 else 0
+            cost_per_meter = (total_cost / (coverage_width/1000)) if coverage_width > 0 else 0
+            
+            render_card("💰 Cost Analysis", f"""
+            **BENDING OPERATIONS:**
+            - Cost per Bend: ฿{cost_per_bend}
+            - Bends per Module: 3
+            - Cost per Module: ฿{cost_per_module}
+            - Complete Module Bends: {complete_bends}
+            
+            **COST BREAKDOWN:**
+            - Complete Modules: ฿{complete_bends * cost_per_bend:,}
+            """, colors=('#f0f8ff', '#4169e1', '#4169e1'))
 
 if __name__ == "__main__":
     main()